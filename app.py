@@ -1,19 +1,54 @@
-from flask import Flask, render_template, request, redirect, url_for, session, send_file, flash
+from flask import Flask, Response, make_response, render_template, request, redirect, url_for, session, send_file, flash
 import os
 import hashlib
+import hmac
 import shutil
 import zipfile
+import time
+import queue
+import threading
+import uuid
 from werkzeug.utils import secure_filename
-from functools import wraps
+from werkzeug.security import safe_join
+from zipstream import ZipStream
+from functools import wraps, lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from collections import OrderedDict, namedtuple
 from datetime import datetime
 
+def read_zip_level():
+    """DEFLATE level for folder ZIPs from ZIP_LEVEL (default 1, the fastest)"""
+    level = int(os.environ.get('ZIP_LEVEL', '1'))
+    if not 0 <= level <= 9:
+        raise ValueError(f'ZIP_LEVEL must be between 0 and 9, got {level}')
+    return level
+
+
+def read_zip_method():
+    """Folder ZIP method from ZIP_METHOD: 'auto' (default), 'deflate' or 'store'"""
+    method = os.environ.get('ZIP_METHOD', 'auto').lower()
+    if method not in ('auto', 'deflate', 'store'):
+        raise ValueError(f"ZIP_METHOD must be 'auto', 'deflate' or 'store', got {method!r}")
+    return method
+
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 app.config['SESSION_TYPE'] = 'filesystem'
 app.config['STORAGE_FOLDER'] = 'storage'
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+# DEFLATE level for folder ZIPs - 1 is fastest, most payloads are already compressed
+app.config['ZIP_LEVEL'] = read_zip_level()
+# Folder ZIP method: 'auto' (store mostly pre-compressed folders), 'deflate' or 'store'
+app.config['ZIP_METHOD'] = read_zip_method()
+app.config['LISTING_CACHE_TTL'] = 5  # seconds a directory listing may be reused
+app.config['LISTING_CACHE_SIZE'] = 256  # most directory listings kept at once
+app.config['UPLOAD_BUFFER_SIZE'] = 1024 * 1024  # 1MB copy chunks when saving uploads
+app.config['LOG_SINK'] = None  # callable(message, level) that receives server events (set by main.py)
+# Let a fronting web server (Apache mod_xsendfile, lighttpd) send file bodies itself
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
 # Allow most common file types - this is an FTP server after all
-app.config['ALLOWED_EXTENSIONS'] = {
+app.config['ALLOWED_EXTENSIONS'] = frozenset({
     # Documents
     'txt', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'odt', 'ods', 'odp',
     # Images
@@ -28,12 +63,46 @@ app.config['ALLOWED_EXTENSIONS'] = {
     # Others
     'iso', 'bin', 'exe', 'msi', 'dmg', 'apk', 'deb', 'rpm', 'sh', 'bat', 'cmd',
     'log', 'csv', 'sql', 'db', 'sqlite', 'md', 'tex', 'ps', 'eps', 'psd', 'ai'
-}
+})
+# Formats that are already compressed - DEFLATE gains almost nothing on these
+app.config['COMPRESSED_EXTENSIONS'] = frozenset({
+    'mp4', 'mkv', 'mov', 'avi', 'jpg', 'jpeg', 'png', 'gif', 'webp',
+    'zip', 'rar', '7z', 'gz', 'bz2', 'xz', 'mp3', 'flac', 'aac', 'ogg',
+    'apk', 'docx', 'xlsx', 'pptx', 'odt', 'ods', 'odp', 'pdf'
+})
 
+# Optional faster DEFLATE for folder ZIPs (pip install zlib-ng). zipfile, and zipstream
+# through it, looks up compressors on its module-level zlib, so swap that in place.
+if os.environ.get('FAST_ZLIB') == '1':
+    try:
+        from zlib_ng import zlib_ng
+        zipfile.zlib = zlib_ng
+    except ImportError:
+        pass
 
 # Create storage folder if it doesn't exist
 os.makedirs(app.config['STORAGE_FOLDER'], exist_ok=True)
 
+# One breadcrumb entry; templates read crumb.name / crumb.path
+Crumb = namedtuple('Crumb', ['name', 'path'])
+
+# Recent directory listings: (dir, folder_path) -> (dir mtime, cached at, files, folders),
+# oldest first so expired and excess entries are evicted from the front
+_listing_cache = OrderedDict()
+_listing_cache_lock = threading.Lock()
+
+# In-progress uploads; hidden from listings and folder ZIPs
+UPLOAD_TEMP_PREFIX = '.upload-'
+
+# Shared pool for writing multi-file uploads to disk in parallel
+upload_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('UPLOAD_WORKERS', '8')))
+
+def log_event(message, level='info'):
+    """Report a server event to the attached dashboard (LOG_SINK), if any"""
+    sink = app.config.get('LOG_SINK')
+    if sink is not None:
+        sink(message, level)
+
 def get_access_privilege():
     """Get the access privilege setting from environment"""
     return os.environ.get('ACCESS_PRIVILEGE', 'upload_download')
@@ -53,10 +122,14 @@ def can_delete():
     privilege = get_access_privilege()
     return privilege == 'upload_download'
 
+@lru_cache(maxsize=4)
+def hash_password(password):
+    """SHA-256 digest of a password"""
+    return hashlib.sha256(password.encode()).digest()
+
 def get_session_password_hash():
-    """Dynamically get the session password hash from environment"""
-    password = os.environ.get('SESSION_PASSWORD', 'default')
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Dynamically get the session password hash from environment (cached per value)"""
+    return hash_password(os.environ.get('SESSION_PASSWORD', 'default'))
 
 def login_required(f):
     @wraps(f)
@@ -67,33 +140,56 @@ def login_required(f):
     return decorated_function
 
 def allowed_file(filename):
-    # For an FTP server, allow all files
-    return len(filename) > 0 and '.' in filename
+    # For an FTP server, allow all files - only require an extension
+    return '.' in filename
+
+def get_zip_compression(entries):
+    """Pick STORED when at least half the bytes are already compressed (unless ZIP_METHOD forces one)"""
+    if app.config['ZIP_METHOD'] == 'store':
+        return zipfile.ZIP_STORED
+    if app.config['ZIP_METHOD'] == 'deflate':
+        return zipfile.ZIP_DEFLATED
+    
+    total_bytes = 0
+    compressed_bytes = 0
+    for name, size in entries:
+        total_bytes += size
+        if name.rpartition('.')[2].lower() in app.config['COMPRESSED_EXTENSIONS']:
+            compressed_bytes += size
+    
+    if total_bytes and compressed_bytes / total_bytes >= 0.5:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+@lru_cache(maxsize=8192)
+def cached_secure_filename(part):
+    """secure_filename for URL path components, which repeat across requests"""
+    return secure_filename(part)
+
+@lru_cache(maxsize=1024)
+def join_storage_path(storage_folder, path):
+    """Sanitize a URL path and join it onto storage_folder (None on traversal)"""
+    safe_parts = [cached_secure_filename(part) for part in path.split('/') if part]
+    return safe_join(storage_folder, *filter(None, safe_parts))
+
+def resolve_storage_path(path):
+    """Join a URL path onto the storage folder, or None if it would escape it"""
+    return join_storage_path(app.config['STORAGE_FOLDER'], path)
 
 def get_safe_path(folder_path):
     """Get safe path that doesn't allow directory traversal"""
     if not folder_path:
         return app.config['STORAGE_FOLDER']
     
-    # Split path into components and sanitize each one
-    path_parts = folder_path.split('/')
-    safe_parts = [secure_filename(part) for part in path_parts if part]
-    
-    # Construct the full path
-    full_path = os.path.normpath(os.path.join(app.config['STORAGE_FOLDER'], *safe_parts))
-    
-    # Verify it's within storage folder (prevent directory traversal)
-    if not full_path.startswith(os.path.normpath(app.config['STORAGE_FOLDER'])):
-        return app.config['STORAGE_FOLDER']
-    
-    return full_path
+    return resolve_storage_path(folder_path) or app.config['STORAGE_FOLDER']
 
+@lru_cache(maxsize=1024)
 def get_breadcrumb(folder_path):
-    """Generate breadcrumb navigation"""
-    breadcrumb = [{'name': 'Storage', 'path': ''}]
+    """Generate breadcrumb navigation (immutable so cached results can be shared)"""
+    breadcrumb = [Crumb('Storage', '')]
     
     if not folder_path:
-        return breadcrumb
+        return tuple(breadcrumb)
     
     parts = folder_path.split('/')
     current_path = ''
@@ -101,9 +197,126 @@ def get_breadcrumb(folder_path):
     for part in parts:
         if part:
             current_path = os.path.join(current_path, part)
-            breadcrumb.append({'name': part, 'path': current_path})
+            breadcrumb.append(Crumb(part, current_path))
     
-    return breadcrumb
+    return tuple(breadcrumb)
+
+@app.template_filter('fmtdate')
+@lru_cache(maxsize=4096)
+def fmtdate(timestamp):
+    """Format an epoch timestamp for display (entries in a folder often share one)"""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+def store_listing(key, entry):
+    """Cache a listing, evicting expired entries and the oldest beyond LISTING_CACHE_SIZE"""
+    expired_before = entry[1] - app.config['LISTING_CACHE_TTL']
+    with _listing_cache_lock:
+        _listing_cache.pop(key, None)
+        _listing_cache[key] = entry
+        while _listing_cache:
+            oldest = next(iter(_listing_cache.values()))
+            if len(_listing_cache) <= app.config['LISTING_CACHE_SIZE'] and oldest[1] >= expired_before:
+                break
+            _listing_cache.popitem(last=False)
+
+def list_directory(current_dir, folder_path):
+    """List files and folders, reusing a recent listing if the directory is unchanged"""
+    key = (current_dir, folder_path)
+    dir_mtime = os.stat(current_dir).st_mtime_ns
+    cached = _listing_cache.get(key)
+    if cached and cached[0] == dir_mtime and time.monotonic() - cached[1] < app.config['LISTING_CACHE_TTL']:
+        return list(cached[2]), list(cached[3])
+    
+    files = []
+    folders = []
+    
+    # URL paths are always '/'-separated, so plain concatenation replaces os.path.join
+    path_prefix = folder_path + '/' if folder_path else ''
+    with os.scandir(current_dir) as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith(UPLOAD_TEMP_PREFIX):
+                continue
+            relative_path = path_prefix + name
+            
+            if entry.is_file():
+                stat = entry.stat()
+                files.append({
+                    'name': name,
+                    'size': stat.st_size,
+                    'modified': int(stat.st_mtime),
+                    'path': relative_path
+                })
+            else:
+                folders.append({
+                    'name': name,
+                    'path': relative_path
+                })
+    
+    # scandir order is arbitrary; sort once here rather than on every cached hit
+    files.sort(key=lambda f: f['name'].lower())
+    folders.sort(key=lambda f: f['name'].lower())
+    store_listing(key, (dir_mtime, time.monotonic(), files, folders))
+    return list(files), list(folders)
+
+def stream_in_background(chunks, max_queued=8):
+    """Yield chunks produced on a worker thread so reading and compressing overlap sending"""
+    # Bounded so a slow client holds at most max_queued chunks in memory
+    chunk_queue = queue.Queue(maxsize=max_queued)
+    stop = threading.Event()
+    done = object()
+    
+    def put(item):
+        # Give up once the consumer is gone instead of blocking forever
+        while not stop.is_set():
+            try:
+                chunk_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+        except Exception as e:
+            put(e)
+        else:
+            put(done)
+    
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = chunk_queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def save_upload(file, current_dir, filename):
+    """Save one uploaded file into current_dir as filename and return the name"""
+    # Write to a private temp file and move it into place, so concurrent writers
+    # of the same name never interleave and readers never see a partial file.
+    # The temp name is fixed-length so long filenames still fit within NAME_MAX.
+    temp_path = os.path.join(current_dir, f'{UPLOAD_TEMP_PREFIX}{uuid.uuid4().hex}.part')
+    try:
+        with open(temp_path, 'xb') as dst:
+            shutil.copyfileobj(file.stream, dst, length=app.config['UPLOAD_BUFFER_SIZE'])
+        os.replace(temp_path, os.path.join(current_dir, filename))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return filename
+
+def redirect_to_folder(folder_path):
+    """Redirect to a folder's listing (the root is /files; /files/ matches no route)"""
+    return redirect(url_for('file_list', folder_path=folder_path or None))
 
 @app.route('/')
 def index():
@@ -115,16 +328,19 @@ def index():
 def login():
     if request.method == 'POST':
         password = request.form.get('password', '')
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        password_hash = hashlib.sha256(password.encode()).digest()
         
         # Get the current session password hash from environment
         session_password_hash = get_session_password_hash()
         
-        if password_hash == session_password_hash:
+        # Constant-time compare so response timing doesn't leak the hash
+        if hmac.compare_digest(password_hash, session_password_hash):
             session['logged_in'] = True
+            log_event('Client logged in')
             flash('Login successful!', 'success')
             return redirect(url_for('file_list'))
         else:
+            log_event('Failed login attempt', 'warning')
             flash('Invalid password!', 'error')
     
     return render_template('login.html')
@@ -152,34 +368,30 @@ def file_list(folder_path=''):
         return redirect(url_for('file_list'))
     
     try:
-        for item in os.listdir(current_dir):
-            item_path = os.path.join(current_dir, item)
-            relative_path = os.path.join(folder_path, item) if folder_path else item
-            
-            if os.path.isfile(item_path):
-                size = os.path.getsize(item_path)
-                modified = datetime.fromtimestamp(os.path.getmtime(item_path)).strftime('%Y-%m-%d %H:%M:%S')
-                files.append({
-                    'name': item,
-                    'size': size,
-                    'modified': modified,
-                    'path': relative_path
-                })
-            else:
-                folders.append({
-                    'name': item,
-                    'path': relative_path
-                })
+        files, folders = list_directory(current_dir, folder_path)
     except Exception as e:
         flash(f'Error reading directory: {str(e)}', 'error')
     
-    # Get breadcrumb navigation
-    breadcrumb = get_breadcrumb(folder_path)
+    privileges = (can_upload(), can_download(), can_delete())
+    
+    # Fingerprint everything the page shows so an unchanged reload gets a 304.
+    # Pending flash messages must still be rendered, so never short-circuit then.
+    etag = hashlib.sha1(repr((folder_path, files, folders, privileges)).encode()).hexdigest()
+    if '_flashes' not in session and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        # Get breadcrumb navigation
+        breadcrumb = get_breadcrumb(folder_path)
+        
+        html = render_template('files.html', files=files, folders=folders, 
+                               current_path=folder_path, breadcrumb=breadcrumb,
+                               can_upload=privileges[0], can_download=privileges[1],
+                               can_delete=privileges[2])
+        response = make_response(html)
     
-    return render_template('files.html', files=files, folders=folders, 
-                         current_path=folder_path, breadcrumb=breadcrumb,
-                         can_upload=can_upload(), can_download=can_download(),
-                         can_delete=can_delete())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/download/<path:file_path>')
 @login_required
@@ -190,18 +402,16 @@ def download_file(file_path):
         return redirect(url_for('file_list'))
     
     try:
-        # Clean the path - split and sanitize each component
-        path_parts = file_path.split('/')
-        safe_parts = [secure_filename(part) for part in path_parts if part]
-        full_path = os.path.normpath(os.path.join(app.config['STORAGE_FOLDER'], *safe_parts))
-        
-        # Verify it's within storage folder
-        if not full_path.startswith(os.path.normpath(app.config['STORAGE_FOLDER'])):
+        # Sanitize each component and keep the result inside the storage folder
+        full_path = resolve_storage_path(file_path)
+        if full_path is None:
             flash('Invalid file path!', 'error')
             return redirect(url_for('file_list'))
         
         if os.path.exists(full_path) and os.path.isfile(full_path):
-            return send_file(full_path, as_attachment=True)
+            log_event(f'Download: {file_path}')
+            # Conditional responses honour Range / If-Modified-Since for resumable downloads
+            return send_file(full_path, as_attachment=True, conditional=True)
         else:
             flash('File not found!', 'error')
             return redirect(url_for('file_list'))
@@ -225,21 +435,32 @@ def download_folder(folder_path):
             flash('Folder not found!', 'error')
             return redirect(url_for('file_list'))
         
-        # Create ZIP file in temporary location
         folder_name = os.path.basename(full_path)
-        zip_path = os.path.join('/tmp', f'{folder_name}.zip')
         
-        # Create ZIP file
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(full_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, full_path)
-                    zipf.write(file_path, arcname)
+        # Collect files and sizes in one walk to choose the compression method
+        # Archive names are a slice of the walked path rather than a relpath per file
+        entries = []
+        prefix_len = len(os.path.join(full_path, ''))
+        for root, dirs, files in os.walk(full_path, topdown=True, followlinks=False):
+            # Skip hidden directories
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for file in files:
+                if file.startswith(UPLOAD_TEMP_PREFIX):
+                    continue
+                file_path = os.path.join(root, file)
+                entries.append((file_path, file_path[prefix_len:], os.path.getsize(file_path)))
+        
+        compress_type = get_zip_compression((arcname, size) for _, arcname, size in entries)
+        compress_level = app.config['ZIP_LEVEL'] if compress_type == zipfile.ZIP_DEFLATED else None
         
-        # Send ZIP file
-        return send_file(zip_path, as_attachment=True, 
-                        download_name=f'{folder_name}.zip')
+        # Build the archive on the fly so bytes go straight from disk to the socket
+        zs = ZipStream(compress_type=compress_type, compress_level=compress_level)
+        for file_path, arcname, _ in entries:
+            zs.add_path(file_path, arcname)
+        
+        log_event(f'Folder download: {folder_path} ({len(entries)} files)')
+        return Response(stream_in_background(zs), mimetype='application/zip',
+                        headers={'Content-Disposition': f'attachment; filename="{folder_name}.zip"'})
     except Exception as e:
         flash(f'Error downloading folder: {str(e)}', 'error')
         return redirect(url_for('file_list'))
@@ -255,7 +476,7 @@ def upload_file():
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'success': False, 'message': msg}), 403
         flash(msg, 'error')
-        return redirect(url_for('file_list', folder_path=request.form.get('current_path', '')))
+        return redirect_to_folder(request.form.get('current_path', ''))
     
     current_path = request.form.get('current_path', '')
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
@@ -265,25 +486,36 @@ def upload_file():
         if is_ajax:
             return jsonify({'success': False, 'message': msg}), 400
         flash(msg, 'error')
-        return redirect(url_for('file_list', folder_path=current_path))
+        return redirect_to_folder(current_path)
     
-    file = request.files['file']
-    if file.filename == '':
+    files = request.files.getlist('file')
+    if any(file.filename == '' for file in files):
         msg = 'No file selected!'
         if is_ajax:
             return jsonify({'success': False, 'message': msg}), 400
         flash(msg, 'error')
-        return redirect(url_for('file_list', folder_path=current_path))
+        return redirect_to_folder(current_path)
     
-    if file and allowed_file(file.filename):
+    if all(allowed_file(file.filename) for file in files):
         try:
             current_dir = get_safe_path(current_path)
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_dir, filename)
-            file.save(filepath)
-            msg = f'File "{filename}" uploaded successfully!'
+            # Parts that sanitize to the same name: the last one wins, as with sequential saves
+            uploads = {secure_filename(file.filename): file for file in files}
+            if len(uploads) == 1:
+                # Single files (one per request from the browser) are saved on the request thread
+                filename, file = next(iter(uploads.items()))
+                filenames = [save_upload(file, current_dir, filename)]
+            else:
+                # Several files in one request are written to disk in parallel
+                filenames = list(upload_pool.map(save_upload, uploads.values(), repeat(current_dir), uploads))
+            log_event(f'Upload: {", ".join(filenames)}')
+            if len(filenames) == 1:
+                msg = f'File "{filenames[0]}" uploaded successfully!'
+            else:
+                msg = f'{len(filenames)} files uploaded successfully!'
             if is_ajax:
-                return jsonify({'success': True, 'message': msg, 'filename': filename}), 200
+                return jsonify({'success': True, 'message': msg, 'filename': filenames[0],
+                                'filenames': filenames}), 200
             flash(msg, 'success')
         except Exception as e:
             msg = f'Error uploading file: {str(e)}'
@@ -296,7 +528,7 @@ def upload_file():
             return jsonify({'success': False, 'message': msg}), 400
         flash(msg, 'error')
     
-    return redirect(url_for('file_list', folder_path=current_path))
+    return redirect_to_folder(current_path)
 
 
 @app.route('/create_folder', methods=['POST'])
@@ -308,17 +540,18 @@ def create_folder():
     
     if not folder_name:
         flash('Folder name cannot be empty!', 'error')
-        return redirect(url_for('file_list', folder_path=current_path))
+        return redirect_to_folder(current_path)
     
     try:
         current_dir = get_safe_path(current_path)
         folder_path = os.path.join(current_dir, secure_filename(folder_name))
         os.makedirs(folder_path, exist_ok=True)
+        log_event(f'Folder created: {folder_name}')
         flash(f'Folder "{folder_name}" created successfully!', 'success')
     except Exception as e:
         flash(f'Error creating folder: {str(e)}', 'error')
     
-    return redirect(url_for('file_list', folder_path=current_path))
+    return redirect_to_folder(current_path)
 
 @app.route('/delete/<path:file_path>')
 @login_required
@@ -329,23 +562,24 @@ def delete_file(file_path):
         return redirect(url_for('file_list'))
     
     try:
-        # Clean the path - split and sanitize each component
+        # Sanitize each component and keep the result inside the storage folder
         path_parts = file_path.split('/')
-        safe_parts = [secure_filename(part) for part in path_parts if part]
-        full_path = os.path.normpath(os.path.join(app.config['STORAGE_FOLDER'], *safe_parts))
+        full_path = resolve_storage_path(file_path)
         
-        # Verify it's within storage folder
-        if not full_path.startswith(os.path.normpath(app.config['STORAGE_FOLDER'])):
+        # Never delete the storage folder itself (e.g. a path that sanitizes to nothing)
+        if full_path is None or full_path == app.config['STORAGE_FOLDER']:
             flash('Invalid file path!', 'error')
             return redirect(url_for('file_list'))
         
         if os.path.exists(full_path):
             if os.path.isfile(full_path):
                 os.remove(full_path)
+                log_event(f'Deleted file: {file_path}')
                 flash(f'File deleted successfully!', 'success')
             else:
                 # It's a directory
                 shutil.rmtree(full_path)
+                log_event(f'Deleted folder: {file_path}')
                 flash(f'Folder deleted successfully!', 'success')
         else:
             flash('File/Folder not found!', 'error')
@@ -354,7 +588,13 @@ def delete_file(file_path):
     
     # Get parent directory to redirect to
     parent_path = '/'.join(path_parts[:-1]) if len(path_parts) > 1 else ''
-    return redirect(url_for('file_list', folder_path=parent_path))
+    return redirect_to_folder(parent_path)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    if os.environ.get('WAITRESS') == '1':
+        # Production WSGI server (pip install waitress)
+        from waitress import serve
+        serve(app, host='0.0.0.0', port=5000, threads=16)
+    else:
+        # Threaded so one long download doesn't block every other client
+        app.run(host='0.0.0.0', debug=False, threaded=True)
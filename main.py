@@ -7,11 +7,12 @@ Server-side Terminal UI with Dark Mode
 import os
 import sys
 import subprocess
+import shutil
 import threading
 import time
 import signal
 import atexit
-from datetime import datetime
+from collections import deque
 from colorama import init, Fore, Style, Back
 from rich.console import Console
 from rich.table import Table
@@ -24,22 +25,91 @@ from rich.syntax import Syntax
 from rich import box
 import pyngrok.ngrok
 from pyngrok import ngrok
+from werkzeug.serving import ThreadedWSGIServer
 
 # Initialize colorama for cross-platform colored text
 init(autoreset=True)
 
+# Shared console; probing the terminal once is enough for every TUI instance
+CONSOLE = Console()
+
+# Dashboard log styling per event level
+LOG_STYLES = {'info': 'green', 'warning': 'yellow', 'error': 'red'}
+
+# Clipboard copy function, resolved on first use (pyperclip is optional)
+_clipboard_copy = None
+
+def try_copy(text):
+    """Copy text to the clipboard if pyperclip and a clipboard are available"""
+    global _clipboard_copy
+    if _clipboard_copy is None:
+        try:
+            import pyperclip
+            _clipboard_copy = pyperclip.copy
+        except ImportError:
+            _clipboard_copy = lambda _text: False
+    try:
+        return _clipboard_copy(text) is not False
+    except Exception:
+        return False  # e.g. no xclip/xsel on Linux
+
+class DrainingWSGIServer(ThreadedWSGIServer):
+    """Threaded WSGI server that can wait, up to a timeout, for in-flight requests to finish"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active_requests = 0
+        self.requests_idle = threading.Condition()
+    
+    def process_request_thread(self, request, client_address):
+        # Runs on the request thread for the whole request, streamed response bodies included
+        with self.requests_idle:
+            self.active_requests += 1
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self.requests_idle:
+                self.active_requests -= 1
+                self.requests_idle.notify_all()
+    
+    def wait_for_requests(self, timeout):
+        """Block until no request is in flight or timeout passes; True if all finished"""
+        with self.requests_idle:
+            return self.requests_idle.wait_for(lambda: self.active_requests == 0, timeout)
+
 class ServerTUI:
     def __init__(self):
-        self.console = Console()
+        self.console = CONSOLE
         self.session_password = None
+        self.password_mask = ""
         self.access_privilege = None
         self.ngrok_url = None
         self.server_running = False
+        self.server = None
+        self.server_thread = None
         self.layout = Layout()
+        self.dashboard_changed = threading.Event()
+        self.terminal_size = None
+        self.log_lines = deque(maxlen=200)  # (timestamp, level, message), newest last
+        self.timestamp = (None, "")  # (second, formatted text), replaced as one unit
+        self.cleaned_up = False
+        atexit.register(self.cleanup)
         
+        # Warm up the Flask app import while the user answers the setup prompts
+        threading.Thread(target=self.preimport_app, daemon=True).start()
+    
+    def preimport_app(self):
+        """Import the Flask app ahead of time (it reads the session settings per request)"""
+        try:
+            import app
+        except Exception:
+            pass  # start_flask_server imports it again and reports the error
+    
     def clear_screen(self):
         """Clear the terminal screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        # ANSI clear + cursor home; colorama's init() makes this work on Windows too
+        sys.stdout.write('\x1b[2J\x1b[H')
+        sys.stdout.flush()
     
     def print_banner(self):
         """Print the application banner"""
@@ -53,13 +123,13 @@ class ServerTUI:
         # ██║        ██║   ██║     
         # ╚═╝        ╚═╝   ╚═╝     
         # """
-
+        
         # banner = r"""
         # ░█▀▀░█░░░█▀█░█▀▀░█░█░░░░░█▀▀░▀█▀░█▀█
         # ░█▀▀░█░░░█▀█░▀▀█░█▀▄░▄▄▄░█▀▀░░█░░█▀▀
         # ░▀░░░▀▀▀░▀░▀░▀▀▀░▀░▀░░░░░▀░░░░▀░░▀░░
         # """
-
+        
         banner = r"""
         ┌───────────────────────────────────────────────────┐
         │                                                   │
@@ -71,7 +141,7 @@ class ServerTUI:
         │                                                   │
         └───────────────────────────────────────────────────┘
         """
-     
+        
         self.console.print(f"[bold blue]{banner}[/bold blue]")
         self.console.print("[bold cyan]Secure FTP-like Server with Ngrok Tunneling[/bold cyan]")
         self.console.print("[dim]Press Ctrl+C to exit[/dim]\n")
@@ -89,6 +159,7 @@ class ServerTUI:
             if password == confirm:
                 if len(password) >= 6:
                     self.session_password = password
+                    self.password_mask = "*" * len(password)
                     self.console.print("[green]✓ Password set successfully![/green]")
                     return password
                 else:
@@ -125,19 +196,27 @@ class ServerTUI:
     
     def start_flask_server(self):
         """Start the Flask server in a separate thread"""
-        # Set the session password and access privilege as environment variables BEFORE importing app
+        # The app reads these per request, so setting them after the background preimport is fine
         os.environ['SESSION_PASSWORD'] = self.session_password
         os.environ['ACCESS_PRIVILEGE'] = self.access_privilege
         
         from app import app
+        app.config['LOG_SINK'] = self.log
         
-        def run_server():
-            app.run(host='127.0.0.1', port=9870, debug=False, use_reloader=False)
+        # Binding here means the server accepts connections as soon as this returns;
+        # a server handle (unlike app.run) can be shut down from cleanup()
+        try:
+            # Threaded so an in-flight upload/download doesn't block other requests
+            self.server = DrainingWSGIServer('127.0.0.1', 9870, app)
+        except OSError as e:
+            self.console.print(f"[red]✗ Could not bind port 9870: {e}[/red]")
+            return None
         
-        server_thread = threading.Thread(target=run_server, daemon=True)
+        server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
         server_thread.start()
-        time.sleep(2)  # Give server time to start
+        self.server_thread = server_thread
         self.server_running = True
+        self.log("Server started on port 9870")
         return server_thread
     
     def start_ngrok_tunnel(self):
@@ -150,8 +229,9 @@ class ServerTUI:
             ngrok.kill()
             
             # Create a new tunnel
-            tunnel = ngrok.connect(9870, "http", bind_tls=True)
+            tunnel = ngrok.connect(9870, "http", schemes=["https"])
             self.ngrok_url = tunnel.public_url
+            self.log(f"Ngrok tunnel established: {self.ngrok_url}")
             
             self.console.print(f"[green]✓ Ngrok tunnel created successfully![/green]")
             self.console.print(f"[bold yellow]Public URL:[/bold yellow] {self.ngrok_url}")
@@ -161,105 +241,152 @@ class ServerTUI:
             self.console.print(f"[red]✗ Failed to create ngrok tunnel: {e}[/red]")
             return None
     
+    def build_dashboard(self):
+        """Build the dashboard layout and its static panels (again only on resize)"""
+        # A fresh tree, so Live keeps rendering the old one until it is handed this one
+        self.layout = Layout()
+        
+        # Drop panels that can't fit instead of rendering them offscreen
+        self.terminal_size = shutil.get_terminal_size()
+        cols, rows = self.terminal_size
+        
+        # Keep the leaf slots so updates don't look panels up by name
+        self.header_slot = Layout(name="header", size=3)
+        main_slot = Layout(name="main", ratio=2)
+        self.status_slot = Layout(name="status", size=8) if rows >= 20 else None
+        self.layout.split(*filter(None, (self.header_slot, main_slot, self.status_slot)))
+        
+        # Stack the side panels on narrow terminals
+        self.left_slot = Layout(name="left", ratio=1)
+        self.right_slot = Layout(name="right", ratio=1)
+        split_main = main_slot.split_row if cols >= 100 else main_slot.split_column
+        split_main(self.left_slot, self.right_slot)
+        
+        # Header
+        header_text = Text("🔒 FTP-LIKE SERVER DASHBOARD", style="bold blue on black")
+        self.header_slot.update(
+            Panel(header_text, box=box.DOUBLE)
+        )
+        
+        # Left Panel - Connection Info
+        connection_table = Table(show_header=True, header_style="bold cyan", box=box.ROUNDED)
+        connection_table.add_column("Property", style="dim")
+        connection_table.add_column("Value", style="bold green")
+        
+        connection_table.add_row("Server Status", "🟢 ONLINE")
+        connection_table.add_row("Local URL", "http://127.0.0.1:9870")
+        connection_table.add_row("Public URL", self.ngrok_url or "Not Available")
+        connection_table.add_row("Session Active", "🟢 YES")
+        connection_table.add_row("Connected Clients", "0")
+        
+        left_panel = Panel(
+            connection_table,
+            title="🌐 Connection Information",
+            border_style="blue",
+            padding=(1, 2)
+        )
+        
+        # Right Panel - Quick Actions
+        actions_text = Text()
+        actions_text.append("Quick Actions:\n\n", style="bold cyan")
+        actions_text.append("1. ", style="yellow")
+        actions_text.append("Open Public URL\n", style="white")
+        actions_text.append("2. ", style="yellow")
+        actions_text.append("Monitor Connections\n", style="white")
+        actions_text.append("3. ", style="yellow")
+        actions_text.append("View Logs\n", style="white")
+        actions_text.append("4. ", style="yellow")
+        actions_text.append("Manage Files\n\n", style="white")
+        actions_text.append("Press ", style="dim")
+        actions_text.append("Ctrl+C", style="bold red")
+        actions_text.append(" to shutdown server", style="dim")
+        
+        right_panel = Panel(
+            actions_text,
+            title="⚡ Quick Actions",
+            border_style="blue",
+            padding=(1, 2)
+        )
+        
+        self.left_slot.update(left_panel)
+        self.right_slot.update(right_panel)
+        
+        # Status Panel - Logs (only its text changes while running)
+        self.status_panel = Panel(
+            Text(),
+            title="📊 Server Logs",
+            border_style="blue",
+            padding=(1, 2)
+        )
+        
+        if self.status_slot:
+            self.status_slot.update(self.status_panel)
+    
+    def log(self, message, level="info"):
+        """Record a server event for the dashboard log panel"""
+        self.log_lines.append((self.log_timestamp(), level, message))
+        self.refresh_dashboard()
+    
+    def log_timestamp(self):
+        """Format the current time, reusing the string for events in the same second"""
+        # Called from request threads; a single tuple read/assign keeps second and text paired
+        now = int(time.time())
+        second, text = self.timestamp
+        if now != second:
+            text = time.strftime("%H:%M:%S", time.localtime(now))
+            self.timestamp = (now, text)
+        return text
+    
+    def update_logs(self):
+        """Refresh the log lines, the only part of the dashboard that changes"""
+        logs = Text()
+        # The status panel fits four lines; show the most recent events
+        for timestamp, level, message in list(self.log_lines)[-4:]:
+            logs.append(f"[{timestamp}] ", style="dim")
+            logs.append(message + "\n", style=LOG_STYLES.get(level, "white"))
+        
+        self.status_panel.renderable = logs
+    
+    def refresh_dashboard(self):
+        """Signal that dashboard state changed and should be redrawn"""
+        self.dashboard_changed.set()
+    
     def create_dashboard(self):
         """Create and display the live dashboard"""
         self.clear_screen()
+        self.build_dashboard()
+        self.log(f"Session password: {self.password_mask}", "warning")
+        self.log("Waiting for connections...")
+        self.update_logs()
         
-        with Live(auto_refresh=False, screen=True) as live:
-            while True:
-                # Create layout
-                self.layout.split(
-                    Layout(name="header", size=3),
-                    Layout(name="main", ratio=2),
-                    Layout(name="status", size=6)
-                )
-                
-                self.layout["main"].split_row(
-                    Layout(name="left", ratio=1),
-                    Layout(name="right", ratio=1)
-                )
-                
-                # Header
-                header_text = Text("🔒 FTP-LIKE SERVER DASHBOARD", style="bold blue on black")
-                self.layout["header"].update(
-                    Panel(header_text, box=box.DOUBLE)
-                )
-                
-                # Left Panel - Connection Info
-                connection_table = Table(show_header=True, header_style="bold cyan", box=box.ROUNDED)
-                connection_table.add_column("Property", style="dim")
-                connection_table.add_column("Value", style="bold green")
-                
-                connection_table.add_row("Server Status", "🟢 ONLINE")
-                connection_table.add_row("Local URL", "http://127.0.0.1:9870")
-                connection_table.add_row("Public URL", self.ngrok_url or "Not Available")
-                connection_table.add_row("Session Active", "🟢 YES")
-                connection_table.add_row("Connected Clients", "0")
-                
-                left_panel = Panel(
-                    connection_table,
-                    title="🌐 Connection Information",
-                    border_style="blue",
-                    padding=(1, 2)
-                )
-                
-                # Right Panel - Quick Actions
-                actions_text = Text()
-                actions_text.append("Quick Actions:\n\n", style="bold cyan")
-                actions_text.append("1. ", style="yellow")
-                actions_text.append("Open Public URL\n", style="white")
-                actions_text.append("2. ", style="yellow")
-                actions_text.append("Monitor Connections\n", style="white")
-                actions_text.append("3. ", style="yellow")
-                actions_text.append("View Logs\n", style="white")
-                actions_text.append("4. ", style="yellow")
-                actions_text.append("Manage Files\n\n", style="white")
-                actions_text.append("Press ", style="dim")
-                actions_text.append("Ctrl+C", style="bold red")
-                actions_text.append(" to shutdown server", style="dim")
-                
-                right_panel = Panel(
-                    actions_text,
-                    title="⚡ Quick Actions",
-                    border_style="blue",
-                    padding=(1, 2)
-                )
-                
-                self.layout["left"].update(left_panel)
-                self.layout["right"].update(right_panel)
-                
-                # Status Panel - Logs
-                current_time = datetime.now().strftime("%H:%M:%S")
-                logs = Text()
-                logs.append(f"[{current_time}] ", style="dim")
-                logs.append("Server started on port 9870\n", style="green")
-                logs.append(f"[{current_time}] ", style="dim")
-                logs.append(f"Ngrok tunnel established: {self.ngrok_url}\n", style="green")
-                logs.append(f"[{current_time}] ", style="dim")
-                logs.append("Waiting for connections...\n", style="cyan")
-                logs.append(f"[{current_time}] ", style="dim")
-                logs.append("Session password: ", style="yellow")
-                logs.append("*" * len(self.session_password) + "\n", style="dim")
-                
-                status_panel = Panel(
-                    logs,
-                    title="📊 Server Logs",
-                    border_style="blue",
-                    padding=(1, 2)
-                )
-                
-                self.layout["status"].update(status_panel)
-                
-                # Update the live display
-                live.update(self.layout, refresh=True)
-                
-                # Check for exit condition
-                try:
-                    time.sleep(1)
-                except KeyboardInterrupt:
-                    self.console.print("\n[bold red]Shutting down server...[/bold red]")
-                    ngrok.kill()
-                    break
+        # Re-layout when the terminal is resized (POSIX only)
+        if hasattr(signal, 'SIGWINCH'):
+            signal.signal(signal.SIGWINCH, lambda *_: self.refresh_dashboard())
+        
+        # Live only redraws when the loop asks it to, so an idle dashboard costs nothing
+        with Live(self.layout, console=self.console, screen=True,
+                  auto_refresh=False) as live:
+            try:
+                last_refresh = 0.0
+                while True:
+                    self.dashboard_changed.wait()
+                    # Coalesce bursts of log lines into at most one redraw per 250 ms
+                    delay = last_refresh + 0.25 - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    self.dashboard_changed.clear()
+                    if shutil.get_terminal_size() != self.terminal_size:
+                        # Rebuilt off-screen, then swapped in under Live's lock
+                        self.build_dashboard()
+                        self.update_logs()
+                        live.update(self.layout)
+                    else:
+                        # Live already holds self.layout, so swapping the log text is enough
+                        self.update_logs()
+                    live.refresh()
+                    last_refresh = time.monotonic()
+            except KeyboardInterrupt:
+                self.console.print("\n[bold red]Shutting down server...[/bold red]")
     
     def run(self):
         """Main run method"""
@@ -282,12 +409,8 @@ class ServerTUI:
                 
                 if tunnel:
                     # Copy URL to clipboard (optional)
-                    try:
-                        import pyperclip
-                        pyperclip.copy(self.ngrok_url)
+                    if try_copy(self.ngrok_url):
                         self.console.print("[dim]✓ URL copied to clipboard[/dim]")
-                    except:
-                        pass
                     
                     self.console.print("\n[bold blue]📋 IMPORTANT INFORMATION[/bold blue]")
                     self.console.print("[bold cyan]Public Access URL:[/bold cyan]", style="bold white")
@@ -310,19 +433,38 @@ class ServerTUI:
                     
                     # Show dashboard
                     self.create_dashboard()
-            
+            else:
+                self.console.print("[red]✗ Flask server did not start on port 9870[/red]")
+        
         except KeyboardInterrupt:
             self.console.print("\n[bold red]Shutdown requested by user[/bold red]")
         except Exception as e:
             self.console.print(f"[bold red]Error: {e}[/bold red]")
         finally:
-            # Cleanup
-            self.console.print("[dim]Cleaning up resources...[/dim]")
-            ngrok.kill()
-            self.console.print("[green]✓ Server shutdown complete[/green]")
+            self.cleanup()
+    
+    def cleanup(self):
+        """Shut down the ngrok tunnel and the server once (also registered with atexit)"""
+        if self.cleaned_up:
+            return
+        self.cleaned_up = True
+        self.console.print("[dim]Cleaning up resources...[/dim]")
+        ngrok.kill()
+        if self.server:
+            # Stop accepting requests, then give in-flight uploads/downloads up to 5s to finish.
+            # Request threads stay daemonic so a stalled client can't block exit past that.
+            self.server.shutdown()
+            self.server_thread.join(timeout=5)
+            if not self.server.wait_for_requests(timeout=5):
+                self.console.print("[yellow]! Some requests were still running at shutdown[/yellow]")
+            self.server.server_close()
+            self.server = None
+        self.console.print("[green]✓ Server shutdown complete[/green]")
 
 def main():
     """Main entry point"""
+    # Turn SIGTERM into a normal exit so atexit cleanup still runs under `kill`
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     tui = ServerTUI()
     tui.run()
 
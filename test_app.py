@@ -6,26 +6,78 @@ Tests authentication, file management, upload/download, and error handling
 import pytest
 import os
 import json
+import re
 import hashlib
+import struct
+import zipfile
 from io import BytesIO
-from app import app
+import app as app_module
+from app import app, allowed_file
 import tempfile
 import shutil
+from pathlib import Path
+from collections import OrderedDict
+
+
+# Built once; bytes are immutable, so each upload only wraps it in a fresh BytesIO
+LARGE_PAYLOAD = os.urandom(app.config['UPLOAD_BUFFER_SIZE'] * 2 + 123)
+
+NOT_FOUND = re.compile(rb'not found', re.IGNORECASE)
+
+
+def empty_dir(path):
+    """Delete everything inside path, using scandir's cached entry types instead of a stat per entry"""
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                empty_dir(entry.path)
+                os.rmdir(entry.path)
+            else:
+                os.unlink(entry.path)
+
+
+@pytest.fixture(scope='module')
+def storage_root(tmp_path_factory):
+    """Storage directory shared by every test in this module, in RAM where available"""
+    # /dev/shm is tmpfs on Linux, so fixture files never touch the disk
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        root = tempfile.mkdtemp(prefix='flask-ftp-', dir='/dev/shm')
+        yield root
+        shutil.rmtree(root, ignore_errors=True)
+    else:
+        yield str(tmp_path_factory.mktemp('storage'))
 
 
 @pytest.fixture
-def client():
-    """Create a test client for the Flask app"""
-    # Create temporary storage directory for tests
-    app.config['TESTING'] = True
-    app.config['STORAGE_FOLDER'] = tempfile.mkdtemp()
+def storage_folder(storage_root, monkeypatch):
+    """Point the app at the shared storage directory, emptied for this test"""
+    os.makedirs(storage_root, exist_ok=True)
+    empty_dir(storage_root)
     
+    # Directory mtimes can repeat across quick tests, so drop cached listings too
+    monkeypatch.setattr(app_module, '_listing_cache', OrderedDict())
+    monkeypatch.setitem(app.config, 'TESTING', True)
+    monkeypatch.setitem(app.config, 'STORAGE_FOLDER', storage_root)
+    return storage_root
+
+
+@pytest.fixture
+def client(storage_folder):
+    """Create a test client for the Flask app"""
     with app.test_client() as client:
         yield client
-    
-    # Cleanup temporary directory
-    if os.path.exists(app.config['STORAGE_FOLDER']):
-        shutil.rmtree(app.config['STORAGE_FOLDER'])
+
+
+@pytest.fixture(scope='module')
+def session_cookie():
+    """Session cookie of a logged-in client, captured once and replayed by logged_in_client"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('SESSION_PASSWORD', 'testpassword123')
+        with app.test_client() as client:
+            client.post('/login', data={'password': 'testpassword123'})
+            with client.session_transaction() as sess:
+                sess.pop('_flashes', None)  # Don't replay the login message in every test
+            return client.get_cookie('session').value
 
 
 @pytest.fixture
@@ -35,22 +87,55 @@ def test_password():
 
 
 @pytest.fixture
-def app_with_password(test_password):
+def app_with_password(test_password, storage_folder, monkeypatch):
     """Create app with a test password"""
-    os.environ['SESSION_PASSWORD'] = test_password
-    from importlib import reload
-    import app as app_module
-    app_module = reload(app_module)
+    # The app reads SESSION_PASSWORD at login time, so no module reload is needed
+    monkeypatch.setenv('SESSION_PASSWORD', test_password)
+    # Folder ZIP tests check archive structure, not compression, so skip DEFLATE
+    monkeypatch.setitem(app.config, 'ZIP_METHOD', 'store')
     
-    app_module.app.config['TESTING'] = True
-    app_module.app.config['STORAGE_FOLDER'] = tempfile.mkdtemp()
-    
-    with app_module.app.test_client() as client:
-        yield client, app_module.app.config['STORAGE_FOLDER']
-    
-    # Cleanup
-    if os.path.exists(app_module.app.config['STORAGE_FOLDER']):
-        shutil.rmtree(app_module.app.config['STORAGE_FOLDER'])
+    with app.test_client() as client:
+        yield client, storage_folder
+
+
+@pytest.fixture
+def logged_in_client(app_with_password, session_cookie):
+    """Client that is already logged in, without a POST /login per test"""
+    client, storage_folder = app_with_password
+    client.set_cookie('session', session_cookie)
+    return client, storage_folder
+
+
+def make_files(root, spec):
+    """Create files (and their parent folders) from a {relative path: content} dict"""
+    for relative_path, content in spec.items():
+        path = Path(root, relative_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content if isinstance(content, bytes) else content.encode())
+
+
+def last_flash(client):
+    """Most recent pending flash message, read from the session without rendering a page"""
+    with client.session_transaction() as sess:
+        return sess['_flashes'][-1][1]
+
+
+def body_matches(response, pattern):
+    """Search the response body chunk by chunk, stopping at the first match"""
+    return any(pattern.search(chunk) for chunk in response.iter_encoded())
+
+
+def peek_magic(response, n=4):
+    """Read the first n bytes (None for the whole first chunk) of a streamed response and close it"""
+    first = next(response.response)[:n]
+    response.close()
+    return first
+
+
+def first_entry_name(chunk):
+    """Name of the entry whose ZIP local file header starts chunk"""
+    name_length = struct.unpack_from('<H', chunk, 26)[0]
+    return chunk[30:30 + name_length].decode()
 
 
 # ============================================
@@ -76,6 +161,31 @@ class TestAppBasics:
     def test_max_file_size_config(self):
         """Test that max content length is configured"""
         assert app.config['MAX_CONTENT_LENGTH'] == 100 * 1024 * 1024
+    
+    def test_zip_level_config(self, monkeypatch):
+        """Test that folder ZIPs default to the fastest DEFLATE level and reject invalid levels"""
+        from app import read_zip_level
+        
+        monkeypatch.delenv('ZIP_LEVEL', raising=False)
+        assert read_zip_level() == 1
+        
+        monkeypatch.setenv('ZIP_LEVEL', '12')
+        with pytest.raises(ValueError):
+            read_zip_level()
+    
+    def test_zip_method_config(self, monkeypatch):
+        """Test ZIP_METHOD defaults to auto and rejects unknown methods"""
+        from app import read_zip_method
+        
+        monkeypatch.delenv('ZIP_METHOD', raising=False)
+        assert read_zip_method() == 'auto'
+        
+        monkeypatch.setenv('ZIP_METHOD', 'STORE')
+        assert read_zip_method() == 'store'
+        
+        monkeypatch.setenv('ZIP_METHOD', 'stored')
+        with pytest.raises(ValueError):
+            read_zip_method()
 
 
 # ============================================
@@ -100,31 +210,58 @@ class TestAuthentication:
         assert response.status_code == 302  # Redirect on success
         
         # Verify session is set
-        response = client.get('/files', follow_redirects=True)
+        response = client.get('/files')
         assert response.status_code == 200
     
     def test_login_with_wrong_password(self, app_with_password):
         """Test login with incorrect password"""
         client, storage_folder = app_with_password
         
-        response = client.post('/login', data={'password': 'wrongpassword'}, follow_redirects=True)
+        response = client.post('/login', data={'password': 'wrongpassword'})
         assert response.status_code == 200
         assert b'invalid' in response.data.lower() or b'error' in response.data.lower()
     
+    def test_login_follows_password_change(self, app_with_password, monkeypatch):
+        """Test that the cached password hash tracks SESSION_PASSWORD changes"""
+        client, storage_folder = app_with_password
+        
+        monkeypatch.setenv('SESSION_PASSWORD', 'changedpassword')
+        
+        response = client.post('/login', data={'password': 'testpassword123'})
+        assert response.status_code == 200  # Old password rejected
+        
+        response = client.post('/login', data={'password': 'changedpassword'})
+        assert response.status_code == 302
+    
+    def test_login_events_reach_log_sink(self, app_with_password, monkeypatch):
+        """Test that login attempts are reported to the dashboard log sink"""
+        client, storage_folder = app_with_password
+        
+        events = []
+        monkeypatch.setitem(app.config, 'LOG_SINK', lambda message, level: events.append((level, message)))
+        client.post('/login', data={'password': 'wrongpassword'})
+        client.post('/login', data={'password': 'testpassword123'})
+        
+        assert events == [('warning', 'Failed login attempt'), ('info', 'Client logged in')]
+    
     def test_login_empty_password(self, client):
         """Test login with empty password"""
-        response = client.post('/login', data={'password': ''}, follow_redirects=True)
+        response = client.post('/login', data={'password': ''})
         assert response.status_code == 200
     
     def test_logout(self, client):
         """Test logout functionality"""
-        response = client.get('/logout', follow_redirects=True)
+        response = client.get('/logout')
+        assert response.status_code == 302
+        response = client.get(response.headers['Location'])
         assert response.status_code == 200
         assert b'logged out' in response.data.lower() or b'login' in response.data.lower()
     
     def test_index_redirect_to_login(self, client):
         """Test that index redirects to login when not authenticated"""
-        response = client.get('/', follow_redirects=True)
+        response = client.get('/')
+        assert response.status_code == 302
+        response = client.get(response.headers['Location'])
         assert response.status_code == 200
         assert b'login' in response.data.lower() or b'password' in response.data.lower()
     
@@ -152,51 +289,131 @@ class TestFileList:
         response = client.get('/files', follow_redirects=False)
         assert response.status_code == 302  # Redirect to login
     
-    def test_file_list_empty_storage(self, app_with_password):
+    def test_file_list_empty_storage(self, logged_in_client):
         """Test file list with empty storage"""
-        client, storage_folder = app_with_password
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        client, storage_folder = logged_in_client
         
         # Access file list
         response = client.get('/files')
         assert response.status_code == 200
     
-    def test_file_list_with_files(self, app_with_password):
+    def test_file_list_with_files(self, logged_in_client):
         """Test file list with existing files"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create test file
         test_file_path = os.path.join(storage_folder, 'test.txt')
         with open(test_file_path, 'w') as f:
             f.write('test content')
         
-        # Login and access file list
-        client.post('/login', data={'password': 'testpassword123'})
+        # Access file list
         response = client.get('/files')
         
         assert response.status_code == 200
         assert b'test.txt' in response.data
     
-    def test_file_list_with_folders(self, app_with_password):
+    def test_file_list_with_folders(self, logged_in_client):
         """Test file list displays folders"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create test folder
         test_folder = os.path.join(storage_folder, 'testfolder')
         os.makedirs(test_folder, exist_ok=True)
         
-        # Login and access file list
-        client.post('/login', data={'password': 'testpassword123'})
+        # Access file list
         response = client.get('/files')
         
         assert response.status_code == 200
         assert b'testfolder' in response.data
     
-    def test_folder_navigation(self, app_with_password):
+    def test_file_list_sorted_by_name(self, logged_in_client):
+        """Test that files are listed in case-insensitive name order"""
+        client, storage_folder = logged_in_client
+        
+        for name in ['b.txt', 'C.txt', 'a.txt']:
+            with open(os.path.join(storage_folder, name), 'w') as f:
+                f.write(name)
+        
+        response = client.get('/files')
+        
+        assert response.status_code == 200
+        positions = [response.data.index(name) for name in (b'a.txt', b'b.txt', b'C.txt')]
+        assert positions == sorted(positions)
+    
+    def test_file_list_sees_new_files(self, logged_in_client):
+        """Test that a cached listing is refreshed when the folder changes"""
+        client, storage_folder = logged_in_client
+        
+        # Prime the listing cache
+        response = client.get('/files')
+        assert b'late.txt' not in response.data
+        
+        # Add a file and list again
+        with open(os.path.join(storage_folder, 'late.txt'), 'w') as f:
+            f.write('added after first listing')
+        
+        response = client.get('/files')
+        assert response.status_code == 200
+        assert b'late.txt' in response.data
+    
+    def test_listing_cache_is_bounded(self, logged_in_client, monkeypatch):
+        """Test that the listing cache evicts the oldest and expired listings"""
+        client, storage_folder = logged_in_client
+        make_files(storage_folder, {f'dir{i}/file.txt': 'content' for i in range(3)})
+        monkeypatch.setitem(app.config, 'LISTING_CACHE_SIZE', 2)
+        
+        for i in range(3):
+            assert client.get(f'/files/dir{i}').status_code == 200
+        assert [key[1] for key in app_module._listing_cache] == ['dir1', 'dir2']
+        
+        # Once the TTL has passed, older listings are dropped on the next store
+        monkeypatch.setitem(app.config, 'LISTING_CACHE_TTL', 0)
+        client.get('/files/dir0')
+        assert [key[1] for key in app_module._listing_cache] == ['dir0']
+    
+    def test_file_list_not_modified(self, logged_in_client):
+        """Test that an unchanged listing is answered with 304 via its ETag"""
+        client, storage_folder = logged_in_client
+        
+        with open(os.path.join(storage_folder, 'etag.txt'), 'w') as f:
+            f.write('etag content')
+        
+        # Fetch the listing and its ETag
+        response = client.get('/files')
+        etag = response.headers['ETag']
+        
+        response = client.get('/files', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        
+        # Changing the folder invalidates the ETag
+        with open(os.path.join(storage_folder, 'new.txt'), 'w') as f:
+            f.write('new content')
+        response = client.get('/files', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert b'new.txt' in response.data
+    
+    def test_fmtdate_filter(self, client):
+        """Test that modification times are formatted in the template filter"""
+        from datetime import datetime
+        from app import fmtdate
+        
+        timestamp = int(datetime(2024, 1, 2, 3, 4, 5).timestamp())
+        assert fmtdate(timestamp) == '2024-01-02 03:04:05'
+        assert app.jinja_env.filters['fmtdate'] is fmtdate
+    
+    def test_breadcrumb(self, client):
+        """Test breadcrumb entries for a nested path"""
+        from app import get_breadcrumb
+        
+        breadcrumb = get_breadcrumb('parent/child')
+        assert [(crumb.name, crumb.path) for crumb in breadcrumb] == [
+            ('Storage', ''), ('parent', 'parent'), ('child', 'parent/child')
+        ]
+        assert get_breadcrumb('parent/child') is breadcrumb  # Memoized
+    
+    def test_folder_navigation(self, logged_in_client):
         """Test navigating into a folder"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create nested folder structure
         test_folder = os.path.join(storage_folder, 'parent', 'child')
@@ -207,16 +424,13 @@ class TestFileList:
         with open(test_file, 'w') as f:
             f.write('nested file')
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
         # Navigate to parent folder
-        response = client.get('/files/parent', follow_redirects=True)
+        response = client.get('/files/parent')
         assert response.status_code == 200
         assert b'child' in response.data
         
         # Navigate to child folder
-        response = client.get('/files/parent/child', follow_redirects=True)
+        response = client.get('/files/parent/child')
         assert response.status_code == 200
         assert b'nested.txt' in response.data
 
@@ -233,112 +447,164 @@ class TestFileUpload:
         response = client.post('/upload', follow_redirects=False)
         assert response.status_code == 302  # Redirect to login
     
-    def test_upload_valid_file(self, app_with_password):
+    def test_upload_valid_file(self, logged_in_client):
         """Test uploading a valid file"""
-        client, storage_folder = app_with_password
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        client, storage_folder = logged_in_client
         
         # Upload file with allowed extension
         data = {
             'file': (BytesIO(b'test file content'), 'testfile.txt'),
             'current_path': ''
         }
-        response = client.post('/upload', data=data, follow_redirects=True)
-        
-        assert response.status_code == 200
-        assert b'uploaded successfully' in response.data.lower()
+        response = client.post('/upload', data=data)
+        assert response.status_code == 302
+        assert 'uploaded successfully' in last_flash(client).lower()
         assert os.path.exists(os.path.join(storage_folder, 'testfile.txt'))
     
-    def test_upload_to_subfolder(self, app_with_password):
+    def test_upload_to_subfolder(self, logged_in_client):
         """Test uploading a file to a subfolder"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create subfolder
         subfolder = os.path.join(storage_folder, 'uploads')
         os.makedirs(subfolder, exist_ok=True)
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
         # Upload file to subfolder
         data = {
             'file': (BytesIO(b'nested file'), 'nested.txt'),
             'current_path': 'uploads'
         }
-        response = client.post('/upload', data=data, follow_redirects=True)
+        response = client.post('/upload', data=data)
+        assert response.status_code == 302
         
-        assert response.status_code == 200
         assert os.path.exists(os.path.join(subfolder, 'nested.txt'))
     
-    def test_upload_multiple_files(self, app_with_password):
+    def test_upload_multiple_files(self, logged_in_client):
         """Test uploading multiple files"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
-        # Upload multiple files
+        # Upload multiple files in a single multipart request
         files = ['file1.txt', 'file2.pdf', 'image.jpg']
+        data = {
+            'file': [(BytesIO(b'test content'), filename) for filename in files],
+            'current_path': ''
+        }
+        response = client.post('/upload', data=data)
+        assert response.status_code == 302
         for filename in files:
-            data = {
-                'file': (BytesIO(b'test content'), filename),
-                'current_path': ''
-            }
-            response = client.post('/upload', data=data, follow_redirects=True)
-            assert response.status_code == 200
             assert os.path.exists(os.path.join(storage_folder, filename))
     
-    def test_upload_invalid_file_type(self, app_with_password):
-        """Test uploading file with disallowed extension"""
-        client, storage_folder = app_with_password
+    def test_upload_several_files_in_one_request(self, logged_in_client):
+        """Test uploading several files in a single multipart request"""
+        client, storage_folder = logged_in_client
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        data = {
+            'file': [(BytesIO(b'first'), 'one.txt'), (BytesIO(b'second'), 'two.txt')],
+            'current_path': ''
+        }
+        response = client.post('/upload', data=data,
+                               headers={'X-Requested-With': 'XMLHttpRequest'})
+        
+        assert response.status_code == 200
+        assert response.get_json()['filenames'] == ['one.txt', 'two.txt']
+        with open(os.path.join(storage_folder, 'two.txt'), 'rb') as f:
+            assert f.read() == b'second'
+    
+    def test_upload_larger_than_copy_buffer(self, logged_in_client):
+        """Test that uploads spanning several copy chunks are written intact"""
+        client, storage_folder = logged_in_client
         
-        # Try to upload .exe file (not allowed)
         data = {
-            'file': (BytesIO(b'malicious'), 'malware.exe'),
+            'file': (BytesIO(LARGE_PAYLOAD), 'large.bin'),
             'current_path': ''
         }
-        response = client.post('/upload', data=data, follow_redirects=True)
+        response = client.post('/upload', data=data,
+                               headers={'X-Requested-With': 'XMLHttpRequest'})
         
         assert response.status_code == 200
-        assert b'not allowed' in response.data.lower()
-        assert not os.path.exists(os.path.join(storage_folder, 'malware.exe'))
+        with open(os.path.join(storage_folder, 'large.bin'), 'rb') as f:
+            assert f.read() == LARGE_PAYLOAD
     
-    def test_upload_no_file(self, app_with_password):
-        """Test upload with no file selected"""
-        client, storage_folder = app_with_password
+    def test_upload_same_name_parts(self, logged_in_client):
+        """Test that parts sharing a sanitized name don't interleave; the last one wins"""
+        client, storage_folder = logged_in_client
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        data = {
+            'file': [(BytesIO(LARGE_PAYLOAD), 'x.txt'), (BytesIO(b'second upload'), 'x.txt')],
+            'current_path': ''
+        }
+        response = client.post('/upload', data=data)
+        assert response.status_code == 302
         
-        # Post without file
-        response = client.post('/upload', follow_redirects=True)
+        with open(os.path.join(storage_folder, 'x.txt'), 'rb') as f:
+            assert f.read() == b'second upload'
+        assert os.listdir(storage_folder) == ['x.txt']  # No temp files left behind
+    
+    def test_upload_long_filename(self, logged_in_client):
+        """Test that the temp file name doesn't shorten the allowed filename length"""
+        client, storage_folder = logged_in_client
         
-        assert response.status_code == 200
-        assert b'no file' in response.data.lower()
+        filename = 'a' * 240 + '.txt'
+        data = {'file': (BytesIO(b'long name'), filename), 'current_path': ''}
+        response = client.post('/upload', data=data)
+        assert response.status_code == 302
+        assert os.path.exists(os.path.join(storage_folder, filename))
     
-    def test_upload_allowed_extensions(self, app_with_password):
-        """Test all allowed file extensions"""
-        client, storage_folder = app_with_password
+    def test_upload_temp_files_hidden(self, logged_in_client):
+        """Test that in-progress uploads are left out of listings and folder ZIPs"""
+        client, storage_folder = logged_in_client
+        make_files(storage_folder, {
+            'partial/done.txt': 'done',
+            'partial/.upload-0123abcd.part': 'half written',
+        })
+        
+        response = client.get('/files/partial')
+        assert b'done.txt' in response.data
+        assert b'.upload-' not in response.data
+        
+        response = client.get('/download-folder/partial')
+        with zipfile.ZipFile(BytesIO(response.data)) as zf:
+            assert zf.namelist() == ['done.txt']
+    
+    def test_upload_invalid_file_type(self, logged_in_client):
+        """Test uploading a file without an extension"""
+        client, storage_folder = logged_in_client
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        # Any extension is allowed, but a name without one is rejected
+        data = {
+            'file': (BytesIO(b'no extension'), 'noextension'),
+            'current_path': ''
+        }
+        response = client.post('/upload', data=data)
+        assert response.status_code == 302
+        assert 'not allowed' in last_flash(client).lower()
+        assert not os.path.exists(os.path.join(storage_folder, 'noextension'))
+    
+    def test_upload_no_file(self, logged_in_client):
+        """Test upload with no file selected"""
+        client, storage_folder = logged_in_client
+        
+        # Post without file
+        response = client.post('/upload')
+        assert response.status_code == 302
+        assert 'no file' in last_flash(client).lower()
+    
+    def test_upload_allowed_extensions(self, logged_in_client):
+        """Test all allowed file extensions"""
+        client, storage_folder = logged_in_client
         
         # Test allowed extensions
         allowed_files = ['doc.txt', 'image.pdf', 'photo.png', 'pic.jpg', 'anim.gif',
                         'archive.zip', 'document.doc', 'sheet.xls', 'slide.ppt']
         
+        data = {
+            'file': [(BytesIO(b'content'), filename) for filename in allowed_files],
+            'current_path': ''
+        }
+        response = client.post('/upload', data=data)
+        assert response.status_code == 302
         for filename in allowed_files:
-            data = {
-                'file': (BytesIO(b'content'), filename),
-                'current_path': ''
-            }
-            response = client.post('/upload', data=data, follow_redirects=True)
-            assert response.status_code == 200
+            assert os.path.exists(os.path.join(storage_folder, filename))
 
 
 # ============================================
@@ -353,9 +619,9 @@ class TestFileDownload:
         response = client.get('/download/testfile.txt', follow_redirects=False)
         assert response.status_code == 302  # Redirect to login
     
-    def test_download_existing_file(self, app_with_password):
+    def test_download_existing_file(self, logged_in_client):
         """Test downloading an existing file"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create test file
         test_file_path = os.path.join(storage_folder, 'download_test.txt')
@@ -363,62 +629,62 @@ class TestFileDownload:
         with open(test_file_path, 'wb') as f:
             f.write(test_content)
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
         # Download file
         response = client.get('/download/download_test.txt')
         assert response.status_code == 200
-        assert test_content in response.data
+        assert response.content_length == len(test_content)
+        assert response.data == test_content
     
-    def test_download_nonexistent_file(self, app_with_password):
-        """Test downloading a file that doesn't exist"""
-        client, storage_folder = app_with_password
+    def test_download_range_request(self, logged_in_client):
+        """Test that partial downloads are served for resumable clients"""
+        client, storage_folder = logged_in_client
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        # Create test file
+        with open(os.path.join(storage_folder, 'range_test.txt'), 'wb') as f:
+            f.write(b'0123456789')
+        
+        # Request only part of the file
+        response = client.get('/download/range_test.txt', headers={'Range': 'bytes=2-5'})
+        assert response.status_code == 206
+        assert response.data == b'2345'
+    
+    def test_download_nonexistent_file(self, logged_in_client):
+        """Test downloading a file that doesn't exist"""
+        client, storage_folder = logged_in_client
         
         # Try to download non-existent file
-        response = client.get('/download/nonexistent.txt', follow_redirects=True)
+        response = client.get('/download/nonexistent.txt')
+        assert response.status_code == 302
+        response = client.get(response.headers['Location'])
         assert response.status_code == 200
-        assert b'not found' in response.data.lower()
+        assert body_matches(response, NOT_FOUND)
     
-    def test_download_with_special_characters(self, app_with_password):
+    def test_download_with_special_characters(self, logged_in_client):
         """Test downloading file with special characters in name"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create file with special characters
         test_file_path = os.path.join(storage_folder, 'test-file_123.txt')
         with open(test_file_path, 'w') as f:
             f.write('special chars test')
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
         # Download file
         response = client.get('/download/test-file_123.txt')
         assert response.status_code == 200
     
-    def test_download_file_from_subfolder(self, app_with_password):
+    def test_download_file_from_subfolder(self, logged_in_client):
         """Test downloading a file from a nested folder"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create nested folder and file
-        nested_folder = os.path.join(storage_folder, 'parent', 'child')
-        os.makedirs(nested_folder, exist_ok=True)
-        
-        test_file = os.path.join(nested_folder, 'nested.txt')
         test_content = b'nested file content'
-        with open(test_file, 'wb') as f:
-            f.write(test_content)
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        make_files(storage_folder, {'parent/child/nested.txt': test_content})
         
         # Download nested file
         response = client.get('/download/parent/child/nested.txt')
         assert response.status_code == 200
-        assert test_content in response.data
+        assert response.content_length == len(test_content)
+        assert response.data == test_content
 
 
 class TestDownloadFolder:
@@ -429,47 +695,109 @@ class TestDownloadFolder:
         response = client.get('/download-folder/testfolder', follow_redirects=False)
         assert response.status_code == 302  # Redirect to login
     
-    def test_download_folder_as_zip(self, app_with_password):
+    def test_download_folder_as_zip(self, logged_in_client):
         """Test downloading a folder as ZIP"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
-        # Create folder with files
-        test_folder = os.path.join(storage_folder, 'zip_test')
-        os.makedirs(test_folder, exist_ok=True)
-        
-        # Create multiple files
-        for i in range(3):
-            test_file = os.path.join(test_folder, f'file{i}.txt')
-            with open(test_file, 'w') as f:
-                f.write(f'file content {i}')
+        # Create folder with multiple files
+        make_files(storage_folder, {
+            'zip_test/file0.txt': 'file content 0',
+            'zip_test/file1.txt': 'file content 1',
+            'zip_test/file2.txt': 'file content 2',
+        })
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        # Download folder as ZIP, reading only the first streamed chunk
+        response = client.get('/download-folder/zip_test', buffered=False)
+        assert response.status_code == 200
+        assert peek_magic(response) == b'PK\x03\x04'  # Local file header signature
+    
+    def test_download_folder_zip_contents(self, logged_in_client):
+        """Test that the streamed ZIP contains every file in the folder"""
+        client, storage_folder = logged_in_client
+        
+        # Create folder with a nested file; hidden directories are left out of the archive
+        make_files(storage_folder, {
+            'zip_contents/top.txt': 'top content',
+            'zip_contents/sub/inner.txt': 'inner content',
+            'zip_contents/.git/config': 'hidden',
+        })
+        
+        # Download folder and inspect the archive
+        response = client.get('/download-folder/zip_contents')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/zip'
+        assert 'zip_contents.zip' in response.headers['Content-Disposition']
         
-        # Download folder as ZIP
-        response = client.get('/download-folder/zip_test')
+        with zipfile.ZipFile(BytesIO(response.data)) as zf:
+            assert sorted(zf.namelist()) == ['sub/inner.txt', 'top.txt']
+            assert zf.read('top.txt') == b'top content'
+            assert zf.read('sub/inner.txt') == b'inner content'
+    
+    def test_download_folder_stores_compressed_media(self, logged_in_client, monkeypatch):
+        """Test that mostly pre-compressed folders are zipped without DEFLATE"""
+        client, storage_folder = logged_in_client
+        monkeypatch.setitem(app.config, 'ZIP_METHOD', 'auto')
+        
+        # Create folder dominated by already-compressed files
+        make_files(storage_folder, {
+            'media/clip.mp4': b'\x00' * 4096,
+            'media/notes.txt': 'notes',
+        })
+        
+        # Every entry in the archive should be stored as-is
+        response = client.get('/download-folder/media')
         assert response.status_code == 200
-        assert b'PK' in response.data[:4]  # ZIP file signature
+        with zipfile.ZipFile(BytesIO(response.data)) as zf:
+            assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
     
-    def test_download_empty_folder_as_zip(self, app_with_password):
+    def test_zip_compression_selection(self, client):
+        """Test choosing STORED vs DEFLATED from the compressed-bytes share"""
+        from app import get_zip_compression
+        
+        assert get_zip_compression([('movie.mp4', 900), ('readme.txt', 100)]) == zipfile.ZIP_STORED
+        assert get_zip_compression([('PHOTO.JPG', 50), ('data.csv', 50)]) == zipfile.ZIP_STORED
+        assert get_zip_compression([('photo.jpg', 10), ('data.csv', 90)]) == zipfile.ZIP_DEFLATED
+        assert get_zip_compression([]) == zipfile.ZIP_DEFLATED
+    
+    def test_zip_method_override(self, client, monkeypatch):
+        """Test that ZIP_METHOD forces a compression method"""
+        from app import get_zip_compression
+        
+        monkeypatch.setitem(app.config, 'ZIP_METHOD', 'store')
+        assert get_zip_compression([('data.csv', 100)]) == zipfile.ZIP_STORED
+        
+        monkeypatch.setitem(app.config, 'ZIP_METHOD', 'deflate')
+        assert get_zip_compression([('movie.mp4', 100)]) == zipfile.ZIP_DEFLATED
+    
+    def test_stream_in_background(self, client):
+        """Test that background streaming preserves order and re-raises errors"""
+        from app import stream_in_background
+        
+        assert list(stream_in_background(iter([b'a', b'b', b'c']), max_queued=1)) == [b'a', b'b', b'c']
+        
+        def failing():
+            yield b'a'
+            raise IOError('disk error')
+        
+        with pytest.raises(IOError):
+            list(stream_in_background(failing()))
+    
+    def test_download_empty_folder_as_zip(self, logged_in_client):
         """Test downloading an empty folder as ZIP"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create empty folder
         test_folder = os.path.join(storage_folder, 'empty_folder')
         os.makedirs(test_folder, exist_ok=True)
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
-        # Download empty folder as ZIP
-        response = client.get('/download-folder/empty_folder')
+        # Download empty folder as ZIP, reading only the first streamed chunk
+        response = client.get('/download-folder/empty_folder', buffered=False)
         assert response.status_code == 200
-        assert b'PK' in response.data[:4]  # ZIP file signature
+        assert peek_magic(response) == b'PK\x05\x06'  # End of central directory signature
     
-    def test_download_nested_folder_as_zip(self, app_with_password):
+    def test_download_nested_folder_as_zip(self, logged_in_client):
         """Test downloading a nested folder as ZIP"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create nested folder structure
         nested_folder = os.path.join(storage_folder, 'parent', 'nested_zip')
@@ -479,13 +807,12 @@ class TestDownloadFolder:
         with open(test_file, 'w') as f:
             f.write('nested content')
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
-        # Download nested folder as ZIP
-        response = client.get('/download-folder/parent/nested_zip')
+        # Download nested folder as ZIP, reading only the first streamed chunk
+        response = client.get('/download-folder/parent/nested_zip', buffered=False)
         assert response.status_code == 200
-        assert b'PK' in response.data[:4]  # ZIP file signature
+        first = peek_magic(response, n=None)
+        assert first[:4] == b'PK\x03\x04'  # Local file header signature
+        assert first_entry_name(first) == 'inside.txt'
 
 
 # ============================================
@@ -500,84 +827,62 @@ class TestCreateFolder:
         response = client.post('/create_folder', follow_redirects=False)
         assert response.status_code == 302  # Redirect to login
     
-    def test_create_folder_success(self, app_with_password):
+    def test_create_folder_success(self, logged_in_client):
         """Test successful folder creation"""
-        client, storage_folder = app_with_password
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        client, storage_folder = logged_in_client
         
         # Create folder
-        response = client.post('/create_folder', 
-                              data={'folder_name': 'newfolder', 'current_path': ''},
-                              follow_redirects=True)
-        
-        assert response.status_code == 200
-        assert b'created successfully' in response.data.lower()
+        response = client.post('/create_folder',
+                              data={'folder_name': 'newfolder', 'current_path': ''})
+        assert response.status_code == 302
+        assert 'created successfully' in last_flash(client).lower()
         assert os.path.exists(os.path.join(storage_folder, 'newfolder'))
     
-    def test_create_folder_in_subfolder(self, app_with_password):
+    def test_create_folder_in_subfolder(self, logged_in_client):
         """Test creating folder in a subfolder"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create parent folder
         parent_folder = os.path.join(storage_folder, 'parent')
         os.makedirs(parent_folder, exist_ok=True)
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
         # Create subfolder inside parent
         response = client.post('/create_folder',
-                              data={'folder_name': 'child', 'current_path': 'parent'},
-                              follow_redirects=True)
+                              data={'folder_name': 'child', 'current_path': 'parent'})
+        assert response.status_code == 302
         
-        assert response.status_code == 200
         assert os.path.exists(os.path.join(parent_folder, 'child'))
     
-    def test_create_multiple_folders(self, app_with_password):
+    def test_create_multiple_folders(self, logged_in_client):
         """Test creating multiple folders"""
-        client, storage_folder = app_with_password
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        client, storage_folder = logged_in_client
         
         folders = ['folder1', 'folder2', 'folder3']
         for folder_name in folders:
             response = client.post('/create_folder',
-                                  data={'folder_name': folder_name, 'current_path': ''},
-                                  follow_redirects=True)
-            assert response.status_code == 200
+                                  data={'folder_name': folder_name, 'current_path': ''})
+            assert response.status_code == 302
             assert os.path.exists(os.path.join(storage_folder, folder_name))
     
-    def test_create_folder_empty_name(self, app_with_password):
+    def test_create_folder_empty_name(self, logged_in_client):
         """Test creating folder with empty name"""
-        client, storage_folder = app_with_password
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        client, storage_folder = logged_in_client
         
         # Try to create folder with empty name
         response = client.post('/create_folder',
-                              data={'folder_name': '', 'current_path': ''},
-                              follow_redirects=True)
-        
-        assert response.status_code == 200
-        assert b'cannot be empty' in response.data.lower()
+                              data={'folder_name': '', 'current_path': ''})
+        assert response.status_code == 302
+        assert 'cannot be empty' in last_flash(client).lower()
     
-    def test_create_folder_with_special_characters(self, app_with_password):
+    def test_create_folder_with_special_characters(self, logged_in_client):
         """Test creating folder with special characters"""
-        client, storage_folder = app_with_password
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        client, storage_folder = logged_in_client
         
         # Create folder with special characters (secure_filename handles this)
         response = client.post('/create_folder',
-                              data={'folder_name': 'my-folder_2024', 'current_path': ''},
-                              follow_redirects=True)
-        
-        assert response.status_code == 200
+                              data={'folder_name': 'my-folder_2024', 'current_path': ''})
+        assert response.status_code == 302
+        assert os.path.exists(os.path.join(storage_folder, 'my-folder_2024'))
 
 
 # ============================================
@@ -592,81 +897,64 @@ class TestDeleteFileFolder:
         response = client.get('/delete/testfile.txt', follow_redirects=False)
         assert response.status_code == 302  # Redirect to login
     
-    def test_delete_file_success(self, app_with_password):
+    def test_delete_file_success(self, logged_in_client):
         """Test successful file deletion"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create test file
         test_file_path = os.path.join(storage_folder, 'delete_me.txt')
         with open(test_file_path, 'w') as f:
             f.write('delete this')
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
         # Delete file
-        response = client.get('/delete/delete_me.txt', follow_redirects=True)
-        
-        assert response.status_code == 200
-        assert b'deleted successfully' in response.data.lower()
+        response = client.get('/delete/delete_me.txt')
+        assert response.status_code == 302
+        assert 'deleted successfully' in last_flash(client).lower()
         assert not os.path.exists(test_file_path)
     
-    def test_delete_folder_success(self, app_with_password):
+    def test_delete_folder_success(self, logged_in_client):
         """Test successful folder deletion"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create test folder
         test_folder = os.path.join(storage_folder, 'delete_folder')
         os.makedirs(test_folder, exist_ok=True)
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
         # Delete folder
-        response = client.get('/delete/delete_folder', follow_redirects=True)
-        
-        assert response.status_code == 200
-        assert b'deleted successfully' in response.data.lower()
+        response = client.get('/delete/delete_folder')
+        assert response.status_code == 302
+        assert 'deleted successfully' in last_flash(client).lower()
         assert not os.path.exists(test_folder)
     
-    def test_delete_nonexistent_file(self, app_with_password):
+    def test_delete_nonexistent_file(self, logged_in_client):
         """Test deleting a file that doesn't exist"""
-        client, storage_folder = app_with_password
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        client, storage_folder = logged_in_client
         
         # Try to delete non-existent file
-        response = client.get('/delete/nonexistent.txt', follow_redirects=True)
+        response = client.get('/delete/nonexistent.txt')
+        assert response.status_code == 302
+        response = client.get(response.headers['Location'])
         
         assert response.status_code == 200
-        assert b'not found' in response.data.lower()
+        assert body_matches(response, NOT_FOUND)
     
-    def test_delete_folder_with_files(self, app_with_password):
+    def test_delete_folder_with_files(self, logged_in_client):
         """Test deleting folder containing files"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create folder with files
         test_folder = os.path.join(storage_folder, 'folder_with_files')
-        os.makedirs(test_folder, exist_ok=True)
-        
-        test_file = os.path.join(test_folder, 'file.txt')
-        with open(test_file, 'w') as f:
-            f.write('content')
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        make_files(storage_folder, {'folder_with_files/file.txt': 'content'})
         
         # Delete folder
-        response = client.get('/delete/folder_with_files', follow_redirects=True)
-        
-        assert response.status_code == 200
-        assert b'deleted successfully' in response.data.lower()
+        response = client.get('/delete/folder_with_files')
+        assert response.status_code == 302
+        assert 'deleted successfully' in last_flash(client).lower()
         assert not os.path.exists(test_folder)
     
-    def test_delete_file_from_subfolder(self, app_with_password):
+    def test_delete_file_from_subfolder(self, logged_in_client):
         """Test deleting a file from a nested folder"""
-        client, storage_folder = app_with_password
+        client, storage_folder = logged_in_client
         
         # Create nested folder and file
         nested_folder = os.path.join(storage_folder, 'parent', 'child')
@@ -676,13 +964,10 @@ class TestDeleteFileFolder:
         with open(test_file, 'w') as f:
             f.write('nested content')
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
-        
         # Delete nested file
-        response = client.get('/delete/parent/child/nested.txt', follow_redirects=True)
+        response = client.get('/delete/parent/child/nested.txt')
+        assert response.status_code == 302
         
-        assert response.status_code == 200
         assert not os.path.exists(test_file)
 
 
@@ -693,47 +978,67 @@ class TestDeleteFileFolder:
 class TestSecurity:
     """Test security features"""
     
-    def test_path_traversal_prevention(self, app_with_password):
+    def test_path_traversal_prevention(self, logged_in_client):
         """Test that path traversal attacks are prevented"""
-        client, storage_folder = app_with_password
-        
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        client, storage_folder = logged_in_client
         
         # Try path traversal attack
-        response = client.get('/download/../../../etc/passwd', follow_redirects=True)
+        response = client.get('/download/../../../etc/passwd')
+        assert response.status_code == 302
+        response = client.get(response.headers['Location'])
         assert response.status_code == 200
-        assert b'not found' in response.data.lower()
+        assert body_matches(response, NOT_FOUND)
     
-    def test_allowed_file_extensions(self, client):
-        """Test that file extension validation works"""
-        from app import allowed_file
+    def test_resolve_storage_path(self, client):
+        """Test that URL paths are sanitized and kept inside storage"""
+        from app import resolve_storage_path
+        
+        storage_folder = app.config['STORAGE_FOLDER']
+        assert resolve_storage_path('a/b.txt') == os.path.join(storage_folder, 'a', 'b.txt')
+        assert resolve_storage_path('../../etc/passwd') == os.path.join(storage_folder, 'etc', 'passwd')
+        assert resolve_storage_path('..') == storage_folder
+    
+    def test_delete_cannot_remove_storage_root(self, logged_in_client):
+        """Test that a path sanitizing to nothing does not delete storage"""
+        client, storage_folder = logged_in_client
         
-        # Test allowed extensions
-        assert allowed_file('document.txt') == True
-        assert allowed_file('image.pdf') == True
-        assert allowed_file('photo.png') == True
-        assert allowed_file('pic.jpg') == True
-        assert allowed_file('archive.zip') == True
-        
-        # Test disallowed extensions
-        assert allowed_file('malware.exe') == False
-        assert allowed_file('script.sh') == False
-        assert allowed_file('virus.bat') == False
-        assert allowed_file('file.py') == False
-    
-    def test_secure_filename_handling(self, app_with_password):
-        """Test that file names are sanitized"""
-        client, storage_folder = app_with_password
+        with open(os.path.join(storage_folder, 'keep.txt'), 'w') as f:
+            f.write('keep me')
         
-        # Login
-        client.post('/login', data={'password': 'testpassword123'})
+        response = client.get('/delete/%2E%2E')
+        assert response.status_code == 302
+        assert os.path.exists(os.path.join(storage_folder, 'keep.txt'))
+    
+    @pytest.mark.parametrize('filename, expected', [
+        # Allowed extensions
+        ('document.txt', True),
+        ('image.pdf', True),
+        ('photo.png', True),
+        ('pic.jpg', True),
+        ('archive.zip', True),
+        # Any extension is accepted - this is an FTP server
+        ('malware.exe', True),
+        ('script.sh', True),
+        ('virus.bat', True),
+        ('file.py', True),
+        # Names without an extension are rejected
+        ('noextension', False),
+        ('', False),
+    ])
+    def test_allowed_file_extensions(self, filename, expected):
+        """Test that uploads need an extension, whatever it is"""
+        assert allowed_file(filename) == expected
+    
+    def test_secure_filename_handling(self, logged_in_client):
+        """Test that file names are sanitized"""
+        client, storage_folder = logged_in_client
         
         # Try to upload file with path traversal in name
         data = {
             'file': (BytesIO(b'content'), '../../../etc/passwd.txt')
         }
-        response = client.post('/upload', data=data, follow_redirects=True)
+        response = client.post('/upload', data=data)
+        assert response.status_code == 302
         
         # Should only allow the filename part
         unsafe_path = os.path.join(storage_folder, '..', '..', '..', 'etc', 'passwd.txt')
@@ -759,10 +1064,9 @@ class TestSessionManagement:
         assert response2.status_code == 200
         
         # Access another protected route
-        response3 = client.post('/create_folder', 
-                               data={'folder_name': 'test'},
-                               follow_redirects=True)
-        assert response3.status_code == 200
+        response3 = client.post('/create_folder',
+                               data={'folder_name': 'test'})
+        assert response3.status_code == 302
     
     def test_logout_clears_session(self, app_with_password):
         """Test that logout clears the session"""